@@ -0,0 +1,4 @@
+"""
+Handwritten notes to markdown workflow.
+Run the processing script with `python -m app.process_notes`.
+"""
@@ -21,19 +21,20 @@ CLIENT_ID = os.getenv("ONEDRIVE_CLIENT_ID") or input("Enter your Azure AD Applic
 CLIENT_SECRET = os.getenv("ONEDRIVE_CLIENT_SECRET") or input("Enter your Azure AD Client Secret: ").strip()
 REDIRECT_URI = "http://localhost:8080"
 
-# Store the authorization code
-auth_code = None
+# Set by the callback handler once the authorization code (or an error) is received
+_auth_event = threading.Event()
+_auth_result = {}
 
 
 class OAuthHandler(BaseHTTPRequestHandler):
     """HTTP handler to receive OAuth callback."""
     
     def do_GET(self):
-        global auth_code
         if self.path.startswith('/?'):
             query_params = parse_qs(self.path[2:])
             if 'code' in query_params:
-                auth_code = query_params['code'][0]
+                _auth_result['code'] = query_params['code'][0]
+                _auth_event.set()
                 print("\n✓ Authorization code received!")
                 self.send_response(200)
                 self.send_header('Content-type', 'text/html')
@@ -41,6 +42,8 @@ class OAuthHandler(BaseHTTPRequestHandler):
                 self.wfile.write(b'<html><body><h1>Authorization successful!</h1><p>You can close this window.</p></body></html>')
             elif 'error' in query_params:
                 error = query_params['error'][0]
+                _auth_result['error'] = error
+                _auth_event.set()
                 print(f"\n✗ Authorization error: {error}")
                 self.send_response(400)
                 self.send_header('Content-type', 'text/html')
@@ -84,17 +87,13 @@ def get_refresh_token():
     webbrowser.open(auth_url)
     
     # Wait for authorization code
+    # Other requests (e.g. favicon or browser prefetch) do not set the event
     print("Waiting for authorization...")
-    timeout = 120  # 2 minutes
-    elapsed = 0
-    check_interval = 0.1  # Check more frequently
-    while auth_code is None and elapsed < timeout:
-        import time
-        time.sleep(check_interval)
-        elapsed += check_interval
+    _auth_event.wait(timeout=120)  # 2 minutes
     
     server.shutdown()
     
+    auth_code = _auth_result.get('code')
     if auth_code is None:
         print("Error: Authorization timed out or was cancelled.")
         return None
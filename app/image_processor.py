@@ -1,23 +1,58 @@
 """
 Image processor for GitHub Actions using GitHub Copilot Models API.
 Handles image and text completion via GitHub Models.
+Completions are coroutines so independent calls can be awaited concurrently.
 """
 
+import base64
+import functools
 import logging
 
+try:
+    # SIMD accelerated base64, several times faster than the standard library for large images
+    import pybase64
+except ImportError:
+    pybase64 = None
+
 logger = logging.getLogger(__name__)
 
 
-def execute_image_completion(client, encoded_image, system_prompt, model="openai/gpt-4.1", temperature=0):
+def to_data_url(image_bytes):
+    """
+    Encodes an image as a base64 JPEG data URL.
+
+    Args:
+        image_bytes (bytes): The image content.
+
+    Returns:
+        str: The data URL, built without an intermediate base64 string.
+    """
+    if pybase64 is not None:
+        return "data:image/jpeg;base64," + pybase64.b64encode_as_string(image_bytes)
+    return (b"data:image/jpeg;base64," + base64.b64encode(image_bytes)).decode('ascii')
+
+
+@functools.lru_cache(maxsize=32)
+def _system_message(system_prompt):
+    """Returns the system message for a prompt, built once and reused across completions."""
+    return {
+        "role": "system",
+        "content": system_prompt
+    }
+
+
+async def execute_image_completion(client, image_url, system_prompt, model="openai/gpt-4.1", temperature=0,
+                                   response_format=None):
     """
     Executes a chat completion based on the system prompt and encoded image.
 
     Args:
-        client: The OpenAI client object.
-        encoded_image (str): The base64 encoded image.
+        client: The AsyncOpenAI client object.
+        image_url (str): The image URL, usually a base64 data URL from to_data_url.
         system_prompt (str): The system prompt.
         model (str): The model name (default: openai/gpt-4.1).
         temperature (float, optional): The temperature of the completion. Defaults to 0.
+        response_format (dict, optional): The response format, e.g. {"type": "json_object"}. Defaults to None.
 
     Returns:
         str: The generated response from the chat completion.
@@ -26,47 +61,49 @@ def execute_image_completion(client, encoded_image, system_prompt, model="openai
     if client is None:
         logger.error("client parameter is required.")
         raise ValueError("client parameter is required.")
-    if encoded_image is None:
-        logger.error("encoded_image parameter is required.")
-        raise ValueError("encoded_image parameter is required.")
+    if image_url is None:
+        logger.error("image_url parameter is required.")
+        raise ValueError("image_url parameter is required.")
     if system_prompt is None:
         logger.error("system_prompt parameter is required.")
         raise ValueError("system_prompt parameter is required.")
 
     messages = [
-        {
-            "role": "system",
-            "content": system_prompt
-        },
+        _system_message(system_prompt),
         {
             "role": "user",
             "content": [
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{encoded_image}"
+                        "url": image_url
                     }
                 }
             ]
         }
     ]
 
+    completion_args = {}
+    if response_format is not None:
+        completion_args['response_format'] = response_format
+
     logger.info("Executing image completion...")
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model=model,
         messages=messages,
-        temperature=temperature
+        temperature=temperature,
+        **completion_args
     )
 
     return response.choices[0].message.content
 
 
-def execute_text_completion(client, text, system_prompt, model="openai/gpt-4.1", temperature=0.3):
+async def execute_text_completion(client, text, system_prompt, model="openai/gpt-4.1", temperature=0.3):
     """
     Executes a chat completion based on the system prompt and text input.
 
     Args:
-        client: The OpenAI client object.
+        client: The AsyncOpenAI client object.
         text (str): The user text input.
         system_prompt (str): The system prompt.
         model (str): The model name (default: openai/gpt-4.1).
@@ -87,10 +124,7 @@ def execute_text_completion(client, text, system_prompt, model="openai/gpt-4.1",
         raise ValueError("system_prompt parameter is required.")
 
     messages = [
-        {
-            "role": "system",
-            "content": system_prompt
-        },
+        _system_message(system_prompt),
         {
             "role": "user",
             "content": text
@@ -98,7 +132,7 @@ def execute_text_completion(client, text, system_prompt, model="openai/gpt-4.1",
     ]
 
     logger.info("Executing text completion...")
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model=model,
         messages=messages,
         temperature=temperature
@@ -3,22 +3,57 @@ Note processor that uses GitHub Copilot Models API to extract text from images.
 Replaces Azure Function functionality.
 """
 
+import asyncio
+import functools
 import logging
-import base64
 import os
 from pathlib import Path
+from types import MappingProxyType
 
-from openai import OpenAI
-from image_processor import execute_image_completion, execute_text_completion, read_file
-from post_processor import remove_markdown_code_blocks, add_datestamp
+import httpx
+from openai import AsyncOpenAI, BadRequestError, DefaultAsyncHttpxClient, UnprocessableEntityError
+from .image_processor import execute_image_completion, execute_text_completion, read_file, to_data_url
+from .post_processor import remove_markdown_code_blocks, parse_ocr_response, add_datestamp, sanitize_filename
+from .note_type_cache import NoteTypeCache
 
 logger = logging.getLogger(__name__)
 
+# Note types returned by the detectNoteType prompt
+NOTE_TYPES = ("PAPER", "WHITEBOARD", "OTHER")
+
+
+@functools.lru_cache(maxsize=1)
+def _load_prompts():
+    """Load prompts once per process and return them as a read-only mapping."""
+    prompts_dir = Path(__file__).parent / "prompts"
+    prompts = {
+        'detectNoteType': read_file(str(prompts_dir / "detectNoteType.txt")),
+        'ocrImage': read_file(str(prompts_dir / "ocrImage.txt")),
+        'ocrPaper': read_file(str(prompts_dir / "ocrPaper.txt")),
+        'ocrWhiteboard': read_file(str(prompts_dir / "ocrWhiteboard.txt")),
+        'proofreadAndSection': read_file(str(prompts_dir / "proofreadAndSection.txt")),
+        'extractMainTitle': read_file(str(prompts_dir / "extractMainTitle.txt"))
+    }
+    # The OCR response also carries the title, following the title extraction rules
+    response_format = read_file(str(prompts_dir / "ocrResponseFormat.txt")).replace(
+        "{TITLE_RULES}", prompts['extractMainTitle']
+    )
+    for name in ('ocrImage', 'ocrPaper', 'ocrWhiteboard'):
+        prompts[name] = f"{prompts[name]}\n\n{response_format}"
+    return MappingProxyType(prompts)
+
+
+def _rejects_json_mode(error) -> bool:
+    """Return True if an invalid request error is about the JSON response format."""
+    details = " ".join(str(value) for value in (error.param, error.code, error.message) if value).lower()
+    return any(marker in details for marker in ("response_format", "json_object", "json mode"))
+
 
 class NoteProcessor:
     """Processor for extracting text from handwritten notes using GitHub Copilot Models."""
     
-    def __init__(self, github_token: str, model: str = "openai/gpt-4.1", base_url: str = None):
+    def __init__(self, github_token: str, model: str = "openai/gpt-4.1", base_url: str = None,
+                 note_type_cache_path: str = None):
         """
         Initialize note processor.
         
@@ -26,6 +61,7 @@ class NoteProcessor:
             github_token: GitHub token for authentication (GITHUB_TOKEN)
             model: Model name (default: openai/gpt-4.1)
             base_url: Custom base URL for GitHub Models API (if different from default)
+            note_type_cache_path: Optional file used to persist detected note types across runs
         """
         if not github_token:
             raise ValueError("github_token is required for GitHub Copilot Models")
@@ -37,31 +73,96 @@ class NoteProcessor:
             "GH_MODELS_URL", 
             "https://models.github.ai/inference"
         )
-        logger.info(f"Using GitHub Copilot Models API with endpoint: {github_models_url}")
-        logger.info(f"Using model: {model}")
+        logger.info("Using GitHub Copilot Models API with endpoint: %s", github_models_url)
+        logger.info("Using model: %s", model)
         
         # Use GitHub token for authentication
-        self.client = OpenAI(
+        # A single async HTTP/2 client multiplexes concurrent completions over kept-alive connections
+        self.client = AsyncOpenAI(
             api_key=github_token,
-            base_url=github_models_url
+            base_url=github_models_url,
+            http_client=DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32)
+            )
         )
         self.model = model
         self.vision_temperature = 0
         self.text_temperature = 0.3
+        # Disabled once the model rejects JSON mode, the OCR response is then parsed as plain text
+        self.json_mode = True
         
-        # Load prompts
-        prompts_dir = Path(__file__).parent / "prompts"
-        self.prompts = {
-            'detectNoteType': read_file(str(prompts_dir / "detectNoteType.txt")),
-            'ocrImage': read_file(str(prompts_dir / "ocrImage.txt")),
-            'ocrPaper': read_file(str(prompts_dir / "ocrPaper.txt")),
-            'ocrWhiteboard': read_file(str(prompts_dir / "ocrWhiteboard.txt")),
-            'proofread': read_file(str(prompts_dir / "proofread.txt")),
-            'sectionHeader': read_file(str(prompts_dir / "sectionHeader.txt")),
-            'extractMainTitle': read_file(str(prompts_dir / "extractMainTitle.txt"))
-        }
+        # Load prompts (read once per process)
+        self.prompts = _load_prompts()
+        
+        # Visually similar images reuse a previously detected note type
+        self.note_type_cache = NoteTypeCache(note_type_cache_path)
+    
+    async def close(self):
+        """Save the note type cache and close the underlying HTTP client."""
+        self.note_type_cache.save()
+        await self.client.close()
+    
+    async def _detect_note_type(self, image_bytes: bytes, image_url: str) -> str:
+        """Detect the note type, skipping the model call if a similar image was already classified."""
+        image_hash = await asyncio.to_thread(NoteTypeCache.compute_hash, image_bytes)
+        note_type = self.note_type_cache.lookup(image_hash) if image_hash else None
+        if note_type:
+            logger.info("Using cached note type: %s", note_type)
+            return note_type
+        
+        logger.info("Detecting note type...")
+        note_type = await execute_image_completion(
+            self.client,
+            image_url,
+            self.prompts['detectNoteType'],
+            self.model,
+            self.vision_temperature
+        )
+        if image_hash and note_type in NOTE_TYPES:
+            self.note_type_cache.add(image_hash, note_type)
+        return note_type
+    
+    async def _extract_title(self, text: str) -> str:
+        """Extract the main title from the given text and add the date stamp."""
+        logger.info("Extracting main title...")
+        extracted_title = await execute_text_completion(
+            self.client,
+            text,
+            self.prompts['extractMainTitle'],
+            self.model,
+            self.text_temperature
+        )
+        return add_datestamp(extracted_title)
     
-    def process_image(self, image_bytes: bytes) -> dict:
+    async def _extract_text(self, image_url: str, ocr_prompt: str) -> str:
+        """Run the OCR completion in JSON mode, retrying without it if the model does not support it."""
+        if self.json_mode:
+            try:
+                return await execute_image_completion(
+                    self.client,
+                    image_url,
+                    ocr_prompt,
+                    self.model,
+                    self.vision_temperature,
+                    response_format={"type": "json_object"}
+                )
+            except (BadRequestError, UnprocessableEntityError) as e:
+                # Other invalid requests (image too large, content filter, ...) would fail the same way
+                if not _rejects_json_mode(e):
+                    raise
+                logger.warning("Model rejected JSON mode, retrying without it: %s", e)
+                self.json_mode = False
+        
+        return await execute_image_completion(
+            self.client,
+            image_url,
+            ocr_prompt,
+            self.model,
+            self.vision_temperature
+        )
+    
+    async def aprocess_image(self, image_bytes: bytes) -> dict:
         """
         Process image and extract text.
         
@@ -71,71 +172,49 @@ class NoteProcessor:
         Returns:
             Dictionary with noteType, extractedTitle, and extractedText
         """
-        # Encode image to base64
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+        # Encode image to a base64 data URL once, shared by every image completion
+        image_url = to_data_url(image_bytes)
         
         # Identify image note type
-        logger.info("Detecting note type...")
-        note_type = execute_image_completion(
-            self.client,
-            image_base64,
-            self.prompts['detectNoteType'],
-            self.model,
-            self.vision_temperature
-        )
+        note_type = await self._detect_note_type(image_bytes, image_url)
         
         # Extract text from the image
-        logger.info(f"Extracting text (note type: {note_type})...")
+        logger.info("Extracting text (note type: %s)...", note_type)
         ocr_prompt = self.prompts['ocrImage']
         if note_type == "PAPER":
             ocr_prompt = self.prompts['ocrPaper']
         elif note_type == "WHITEBOARD":
             ocr_prompt = self.prompts['ocrWhiteboard']
         
-        extracted_text = execute_image_completion(
-            self.client,
-            image_base64,
-            ocr_prompt,
-            self.model,
-            self.vision_temperature
-        )
+        # The OCR prompt asks for a JSON object with the title and text
+        ocr_response = await self._extract_text(image_url, ocr_prompt)
+        extracted_text, extracted_title = parse_ocr_response(ocr_response)
+        # The data URL is no longer needed, release it before the text completions
+        del image_url
         
         # Post-process the extracted text
         if note_type == "PAPER" or note_type == "WHITEBOARD":
-            logger.info("Proofreading text...")
-            extracted_text = execute_text_completion(
+            logger.info("Proofreading text and adding section headers...")
+            extracted_text = await execute_text_completion(
                 self.client,
                 extracted_text,
-                self.prompts['proofread'],
-                self.model,
-                self.text_temperature
-            )
-            
-            logger.info("Adding section headers...")
-            extracted_text = execute_text_completion(
-                self.client,
-                extracted_text,
-                self.prompts['sectionHeader'],
+                self.prompts['proofreadAndSection'],
                 self.model,
                 self.text_temperature
             )
         
         extracted_text = remove_markdown_code_blocks(extracted_text)
         
-        # Extract title
-        logger.info("Extracting main title...")
-        extracted_title = execute_text_completion(
-            self.client,
-            extracted_text,
-            self.prompts['extractMainTitle'],
-            self.model,
-            self.text_temperature
-        )
-        extracted_title = add_datestamp(extracted_title)
+        # Fall back to a separate title extraction if the OCR response had no title
+        if extracted_title is None:
+            extracted_title = await self._extract_title(extracted_text)
+        else:
+            extracted_title = add_datestamp(extracted_title)
+        # The title names the markdown and image files
+        extracted_title = sanitize_filename(extracted_title)
         
         return {
             "noteType": note_type,
             "extractedTitle": extracted_title,
             "extractedText": extracted_text
         }
-
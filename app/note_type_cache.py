@@ -0,0 +1,113 @@
+"""
+Note type cache keyed by perceptual image hash.
+Lets visually similar images reuse a previous note type detection.
+"""
+
+import json
+import logging
+import os
+from io import BytesIO
+from typing import Dict, Optional
+
+import imagehash
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class NoteTypeCache:
+    """Maps perceptual hashes of images to their detected note type."""
+
+    # Maximum Hamming distance between hashes for images to count as similar
+    MAX_DISTANCE = 5
+    # Maximum number of entries kept, oldest entries are dropped first
+    MAX_ENTRIES = 1000
+
+    def __init__(self, cache_path: Optional[str] = None):
+        """
+        Initialize note type cache.
+
+        Args:
+            cache_path: Optional JSON file used to persist the cache across runs
+        """
+        self.cache_path = cache_path
+        self._entries: Dict[str, str] = {}
+        self._hashes: Dict[str, imagehash.ImageHash] = {}
+        self._dirty = False
+        if cache_path:
+            self._load()
+
+    @staticmethod
+    def compute_hash(image_bytes: bytes) -> Optional[str]:
+        """
+        Compute the perceptual hash of an image.
+
+        Args:
+            image_bytes: Image file content as bytes
+
+        Returns:
+            Hex encoded 64-bit perceptual hash, or None if the image could not be read
+        """
+        try:
+            with Image.open(BytesIO(image_bytes)) as img:
+                return str(imagehash.phash(img))
+        except Exception as e:
+            logger.warning("Could not compute image hash: %s", e)
+            return None
+
+    def lookup(self, image_hash: str) -> Optional[str]:
+        """Return the note type of the closest cached image within MAX_DISTANCE, if any."""
+        if image_hash in self._entries:
+            return self._entries[image_hash]
+
+        target = imagehash.hex_to_hash(image_hash)
+        best_type = None
+        best_distance = self.MAX_DISTANCE + 1
+        for key, cached_hash in self._hashes.items():
+            distance = target - cached_hash
+            if distance < best_distance:
+                best_distance = distance
+                best_type = self._entries[key]
+        return best_type
+
+    def add(self, image_hash: str, note_type: str):
+        """Record the note type detected for an image hash."""
+        self._entries.pop(image_hash, None)
+        self._entries[image_hash] = note_type
+        self._hashes[image_hash] = imagehash.hex_to_hash(image_hash)
+        while len(self._entries) > self.MAX_ENTRIES:
+            oldest = next(iter(self._entries))
+            del self._entries[oldest]
+            del self._hashes[oldest]
+        self._dirty = True
+
+    def save(self):
+        """Atomically write the cache to cache_path if it changed."""
+        if not self.cache_path or not self._dirty:
+            return
+        temp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(self._entries, file)
+            os.replace(temp_path, self.cache_path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning("Could not write note type cache: %s", e)
+
+    def _load(self):
+        """Load cache entries from cache_path, ignoring a missing or invalid file."""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(entries, dict):
+            return
+        for image_hash, note_type in entries.items():
+            try:
+                self._hashes[image_hash] = imagehash.hex_to_hash(image_hash)
+            except ValueError:
+                continue
+            self._entries[image_hash] = note_type
+        logger.info("Loaded %s cached note type(s)", len(self._entries))
@@ -3,10 +3,19 @@ OneDrive client using Microsoft Graph API.
 Replaces Azure Logic App OneDrive connector functionality.
 """
 
+import base64
+import json
 import logging
+import os
 import requests
-from typing import List, Dict, Optional
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import BinaryIO, List, Dict, Optional, Tuple
 import time
+from urllib.parse import quote
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +25,25 @@ class OneDriveClient:
     
     GRAPH_API_BASE = "https://graph.microsoft.com/v1.0"
     TOKEN_URL = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
+    LIST_FIELDS = "id,name,file,folder,size,lastModifiedDateTime"
+    LIST_PAGE_SIZE = 200
+    BATCH_LIMIT = 20
+    # Keep base64 encoded uploads within the batch request size limit
+    BATCH_MAX_UPLOAD_BYTES = 3 * 1024 * 1024
+    BATCH_RETRIES = 3
+    # Pause applied when Graph reports the throttling limit has been reached
+    THROTTLE_BACKOFF_SECONDS = 1
+    # Larger files are uploaded through an upload session, in chunks of a multiple of 320 KiB
+    SIMPLE_UPLOAD_MAX_BYTES = 4 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE = 25 * 320 * 1024
+    # Server-side copies replace an existing destination file, like uploads do
+    COPY_CONFLICT_BEHAVIOR = "@microsoft.graph.conflictBehavior=replace"
+    # Copies run asynchronously on the server, their progress is polled until they complete
+    COPY_POLL_INTERVAL_SECONDS = 1
+    COPY_TIMEOUT_SECONDS = 120
     
-    def __init__(self, client_id: str, client_secret: str, refresh_token: str):
+    def __init__(self, client_id: str, client_secret: str, refresh_token: str,
+                 token_cache_path: Optional[str] = None, pool_size: int = 16):
         """
         Initialize OneDrive client.
         
@@ -25,19 +51,99 @@ class OneDriveClient:
             client_id: Azure AD application client ID
             client_secret: Azure AD application client secret
             refresh_token: OAuth2 refresh token
+            token_cache_path: Optional file used to persist the access token across runs
+            pool_size: Number of keep-alive connections kept per host, at least the number of threads using the client
         """
         self.client_id = client_id
         self.client_secret = client_secret
         self.refresh_token = refresh_token
         self.access_token = None
         self.token_expires_at = 0
+        self.token_cache_path = token_cache_path
+        # Only one thread exchanges the refresh token at a time
+        self._refresh_lock = threading.Lock()
+        self._background_refresh_lock = threading.Lock()
+        self._background_refresh = None
+        
+        # Reuse connections across all Graph and token requests
+        self.session = requests.Session()
+        # Retry throttled and failed requests with exponential backoff, honoring Retry-After.
+        # Only GET and PUT are safe to resend blindly, a POST or PATCH may already have been
+        # applied when a 5xx arrives (batches resend their own throttled sub-requests)
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            backoff_jitter=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET', 'PUT'],
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.session.mount(
+            'https://', HTTPAdapter(pool_connections=16, pool_maxsize=pool_size, max_retries=retry)
+        )
+        # The token exchange has no side effects on the drive, so its POST is retried as well
+        self.session.mount(
+            self.TOKEN_URL, HTTPAdapter(max_retries=retry.new(allowed_methods=['POST']))
+        )
+        self.session.hooks['response'].append(self._check_throttling)
+        self.session.hooks['response'].append(self._retry_unauthorized)
+        
+        # Folders known to exist, so repeated uploads skip the existence checks
+        self._folder_cache = set()
         
     def _get_access_token(self) -> str:
-        """Get or refresh access token."""
+        """Get or refresh access token. Safe to call from multiple threads."""
         # Check if token is still valid (with 5 minute buffer)
-        if self.access_token and time.time() < self.token_expires_at - 300:
+        if self._has_valid_token():
+            # Refresh in the background when less than 10 minutes remain
+            if time.time() > self.token_expires_at - 600:
+                self._start_background_refresh()
             return self.access_token
         
+        with self._refresh_lock:
+            # Another thread may have refreshed the token while this one waited
+            if self._has_valid_token():
+                return self.access_token
+            
+            # Reuse a token persisted by a previous run if it is still valid
+            if self.token_cache_path and self._load_cached_token():
+                return self.access_token
+            
+            return self._refresh_access_token()
+    
+    def _has_valid_token(self) -> bool:
+        """Check if the access token is valid for at least another 5 minutes."""
+        return bool(self.access_token) and time.time() < self.token_expires_at - 300
+    
+    def _start_background_refresh(self):
+        """Refresh the access token in a background thread while the current one is still used."""
+        with self._background_refresh_lock:
+            if self._background_refresh is not None and self._background_refresh.is_alive():
+                return
+            self._background_refresh = threading.Thread(target=self._background_refresh_token, daemon=True)
+            self._background_refresh.start()
+    
+    def _background_refresh_token(self):
+        """Refresh the access token, logging failures since the current token is still valid."""
+        try:
+            with self._refresh_lock:
+                # Skip if the token was already refreshed by another thread
+                if time.time() > self.token_expires_at - 600:
+                    self._refresh_access_token()
+        except Exception as e:
+            logger.warning("Background access token refresh failed: %s", e)
+    
+    def _force_refresh(self, rejected_token: str) -> str:
+        """Refresh the access token after Graph rejected it, unless another thread already did."""
+        with self._refresh_lock:
+            if self.access_token == rejected_token:
+                logger.info("Access token was rejected")
+                self._refresh_access_token()
+            return self.access_token
+    
+    def _refresh_access_token(self) -> str:
+        """Exchange the refresh token for a new access token."""
         logger.info("Refreshing access token...")
         
         data = {
@@ -48,7 +154,7 @@ class OneDriveClient:
             'scope': 'Files.ReadWrite offline_access'
         }
         
-        response = requests.post(self.TOKEN_URL, data=data)
+        response = self.session.post(self.TOKEN_URL, data=data)
         response.raise_for_status()
         
         token_data = response.json()
@@ -62,16 +168,57 @@ class OneDriveClient:
             if new_refresh_token != self.refresh_token:
                 logger.warning("⚠️  NEW REFRESH TOKEN ISSUED by Microsoft!")
                 logger.warning("⚠️  Old token may expire soon. Update your GitHub secret ONEDRIVE_REFRESH_TOKEN with:")
-                logger.warning(f"⚠️  {new_refresh_token[:20]}...{new_refresh_token[-20:]}")
+                logger.warning("⚠️  %s...%s", new_refresh_token[:20], new_refresh_token[-20:])
                 # Update the refresh token for this session
                 self.refresh_token = new_refresh_token
                 # Update environment variable so subsequent API calls in this run use the new token
-                import os
                 os.environ['ONEDRIVE_REFRESH_TOKEN'] = new_refresh_token
         
+        if self.token_cache_path:
+            self._save_cached_token()
+        
         logger.info("Access token refreshed successfully")
         return self.access_token
     
+    def _load_cached_token(self) -> bool:
+        """Load access token from the token cache file. Returns True if a valid token was loaded."""
+        try:
+            with open(self.token_cache_path, 'r', encoding='utf-8') as file:
+                cached = json.load(file)
+        except (OSError, ValueError):
+            return False
+        
+        # Ignore malformed caches, tokens issued to a different application or close to expiry
+        if not isinstance(cached, dict) or cached.get('client_id') != self.client_id:
+            return False
+        access_token = cached.get('access_token')
+        token_expires_at = cached.get('token_expires_at')
+        if not isinstance(access_token, str) or not isinstance(token_expires_at, (int, float)):
+            return False
+        if time.time() >= token_expires_at - 300:
+            return False
+        
+        self.access_token = access_token
+        self.token_expires_at = token_expires_at
+        logger.info("Using cached access token")
+        return True
+    
+    def _save_cached_token(self):
+        """Atomically write the access token to the token cache file, readable by the owner only."""
+        cached = {
+            'client_id': self.client_id,
+            'access_token': self.access_token,
+            'token_expires_at': self.token_expires_at
+        }
+        temp_path = f"{self.token_cache_path}.tmp"
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(cached, file)
+            os.replace(temp_path, self.token_cache_path)
+        except OSError as e:
+            logger.warning("Could not write token cache: %s", e)
+    
     def _get_headers(self) -> Dict[str, str]:
         """Get headers for API requests."""
         return {
@@ -89,52 +236,62 @@ class OneDriveClient:
             return "/drive/root"
         return f"/drive/root:/{folder_path}:"
     
-    def list_files(self, folder_path: str) -> List[Dict]:
+    def list_files(self, folder_path: str, select: Optional[str] = None, filter: Optional[str] = None) -> List[Dict]:
         """
         List files in a OneDrive folder.
         
         Args:
             folder_path: Path to folder (e.g., "Handwritten Notes")
+            select: Optional comma separated item fields to return, defaults to LIST_FIELDS
+            filter: Optional OData filter expression (e.g., "file ne null").
+                Not supported by OneDrive personal accounts, filter the results instead
             
         Returns:
             List of file metadata dictionaries
         """
         path = self._get_drive_path(folder_path)
-        url = f"{self.GRAPH_API_BASE}{path}/children"
+        # Only request the fields used by callers, in large pages
+        url = f"{self.GRAPH_API_BASE}{path}/children?$select={select or self.LIST_FIELDS}&$top={self.LIST_PAGE_SIZE}"
+        if filter:
+            url += f"&$filter={quote(filter)}"
         
         files = []
         while url:
-            response = requests.get(url, headers=self._get_headers())
+            response = self.session.get(url, headers=self._get_headers())
             response.raise_for_status()
             
             data = response.json()
             files.extend(data.get('value', []))
             
-            # Check for next page
+            # Check for next page (an absolute URL that keeps the query parameters)
             url = data.get('@odata.nextLink')
-            if url:
-                # Remove base URL if present
-                url = url.replace(self.GRAPH_API_BASE, '')
         
         return files
     
-    def download_file(self, file_path: str) -> bytes:
+    def download_file(self, file_path: str, fp: Optional[BinaryIO] = None) -> Optional[bytes]:
         """
         Download file from OneDrive.
         
         Args:
             file_path: Path to file (e.g., "Handwritten Notes/image.jpg")
+            fp: Optional binary file object to stream the content into instead of buffering it
             
         Returns:
-            File content as bytes
+            File content as bytes, or None if the content was written to fp
         """
         path = self._get_drive_path(file_path)
         url = f"{self.GRAPH_API_BASE}{path}/content"
         
-        response = requests.get(url, headers=self._get_headers())
-        response.raise_for_status()
+        if fp is None:
+            response = self.session.get(url, headers=self._get_headers())
+            response.raise_for_status()
+            return response.content
         
-        return response.content
+        with self.session.get(url, headers=self._get_headers(), stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            shutil.copyfileobj(response.raw, fp)
+        return None
     
     def upload_file(self, file_path: str, content: bytes, content_type: str = None):
         """
@@ -146,6 +303,10 @@ class OneDriveClient:
             content: File content as bytes
             content_type: MIME type (e.g., "text/markdown", "image/jpeg")
         """
+        if len(content) > self.SIMPLE_UPLOAD_MAX_BYTES:
+            self.upload_large(file_path, content)
+            return
+        
         # Ensure parent folder exists
         path_parts = file_path.rsplit('/', 1)
         if len(path_parts) == 2:
@@ -163,21 +324,51 @@ class OneDriveClient:
         if content_type:
             headers['Content-Type'] = content_type
         
-        response = requests.put(url, headers=headers, data=content)
+        response = self.session.put(url, headers=headers, data=content)
         response.raise_for_status()
         
-        logger.info(f"File uploaded successfully: {file_path}")
+        logger.info("File uploaded successfully: %s", file_path)
+    
+    def upload_large(self, file_path: str, content: bytes):
+        """
+        Upload a large file to OneDrive through a resumable upload session.
+        Creates parent folders if they don't exist. An existing file is replaced.
+        
+        Args:
+            file_path: Destination path (e.g., "second-brain/second-brain/_scans/file.jpg")
+            content: File content as bytes
+        """
+        parent_folder = file_path.rsplit('/', 1)[0] if '/' in file_path else ""
+        self._ensure_folder_exists(parent_folder)
+        
+        path = self._get_drive_path(file_path)
+        url = f"{self.GRAPH_API_BASE}{path}/createUploadSession"
+        payload = {'item': {'@microsoft.graph.conflictBehavior': 'replace'}}
+        
+        response = self.session.post(url, headers=self._get_headers(), json=payload)
+        response.raise_for_status()
+        upload_url = response.json()['uploadUrl']
+        
+        # Chunks must be uploaded in order; the upload URL is pre-authenticated,
+        # so the Authorization header must not be sent
+        total_size = len(content)
+        for start in range(0, total_size, self.UPLOAD_CHUNK_SIZE):
+            chunk = content[start:start + self.UPLOAD_CHUNK_SIZE]
+            headers = {'Content-Range': f"bytes {start}-{start + len(chunk) - 1}/{total_size}"}
+            response = self.session.put(upload_url, headers=headers, data=chunk)
+            response.raise_for_status()
+        
+        logger.info("File uploaded successfully: %s", file_path)
     
     def _ensure_folder_exists(self, folder_path: str):
         """Ensure folder exists, creating it if necessary."""
         if not folder_path:
             return
         
-        # Check if folder exists
-        if self.file_exists(folder_path):
+        if folder_path in self._folder_cache:
             return
         
-        # Create folder recursively
+        # Create folder recursively, existing folders are reported as a conflict
         parts = folder_path.split('/')
         current_path = ""
         for part in parts:
@@ -188,7 +379,7 @@ class OneDriveClient:
             else:
                 current_path = part
             
-            if not self.file_exists(current_path):
+            if current_path not in self._folder_cache:
                 self._create_folder(current_path)
     
     def _create_folder(self, folder_path: str):
@@ -207,15 +398,16 @@ class OneDriveClient:
         payload = {
             "name": folder_name,
             "folder": {},
-            "@microsoft.graph.conflictBehavior": "rename"
+            "@microsoft.graph.conflictBehavior": "fail"
         }
         
-        response = requests.post(url, headers=self._get_headers(), json=payload)
+        response = self.session.post(url, headers=self._get_headers(), json=payload)
         if response.status_code == 409:  # Already exists
-            logger.info(f"Folder already exists: {folder_path}")
+            logger.info("Folder already exists: %s", folder_path)
         else:
             response.raise_for_status()
-            logger.info(f"Folder created: {folder_path}")
+            logger.info("Folder created: %s", folder_path)
+        self._folder_cache.add(folder_path)
     
     def move_file(self, source_path: str, dest_path: str):
         """
@@ -226,6 +418,72 @@ class OneDriveClient:
             source_path: Source file path
             dest_path: Destination file path
         """
+        payload = self._prepare_move(dest_path)
+        
+        source_path_api = self._get_drive_path(source_path)
+        url = f"{self.GRAPH_API_BASE}{source_path_api}"
+        
+        response = self.session.patch(url, headers=self._get_headers(), json=payload)
+        response.raise_for_status()
+        
+        logger.info("File moved successfully: %s -> %s", source_path, dest_path)
+    
+    def copy_file(self, source_path: str, dest_path: str):
+        """
+        Copy file to destination on the server, without downloading and uploading the content.
+        Creates destination folder if it doesn't exist. An existing destination file is replaced.
+        
+        Args:
+            source_path: Source file path
+            dest_path: Destination file path
+        """
+        payload = self._prepare_move(dest_path)
+        
+        source_path_api = self._get_drive_path(source_path)
+        url = f"{self.GRAPH_API_BASE}{source_path_api}/copy?{self.COPY_CONFLICT_BEHAVIOR}"
+        
+        # The copy is accepted (202) and completed asynchronously by the server
+        response = self.session.post(url, headers=self._get_headers(), json=payload)
+        response.raise_for_status()
+        self._wait_for_copy(response.headers.get('Location'), dest_path)
+        
+        logger.info("File copied successfully: %s -> %s", source_path, dest_path)
+    
+    def _wait_for_copy(self, monitor_url: Optional[str], dest_path: str):
+        """
+        Wait for an asynchronous copy to complete by polling its monitor URL.
+        
+        Args:
+            monitor_url: Monitor URL from the Location header of the accepted copy request
+            dest_path: Destination file path, used in error messages
+            
+        Raises:
+            requests.HTTPError: If the copy failed or cannot be monitored
+            TimeoutError: If the copy did not complete within COPY_TIMEOUT_SECONDS
+        """
+        if not monitor_url:
+            raise requests.HTTPError(f"Copy to {dest_path} returned no monitor URL")
+        
+        deadline = time.time() + self.COPY_TIMEOUT_SECONDS
+        while True:
+            # The monitor URL is pre-authenticated, and may redirect to the new item once the copy completed
+            response = self.session.get(monitor_url, allow_redirects=False)
+            if response.status_code == 303:
+                return
+            response.raise_for_status()
+            
+            status = response.json()
+            if status.get('status') == 'completed':
+                return
+            if status.get('status') == 'failed':
+                error = status.get('error', {}).get('message', '')
+                raise requests.HTTPError(f"Copy to {dest_path} failed: {error}")
+            if time.time() >= deadline:
+                raise TimeoutError(f"Copy to {dest_path} did not complete within {self.COPY_TIMEOUT_SECONDS}s")
+            time.sleep(self.COPY_POLL_INTERVAL_SECONDS)
+    
+    def _prepare_move(self, dest_path: str) -> Dict:
+        """Ensure the destination folder exists and build the move request payload."""
         # Ensure destination folder exists
         dest_parts = dest_path.rsplit('/', 1)
         if len(dest_parts) == 2:
@@ -236,26 +494,208 @@ class OneDriveClient:
             dest_folder = ""
             dest_name = dest_path
         
-        source_path_api = self._get_drive_path(source_path)
-        url = f"{self.GRAPH_API_BASE}{source_path_api}"
-        
         # Build parent reference path
         if dest_folder:
             parent_path = f"/drive/root:/{dest_folder}"
         else:
             parent_path = "/drive/root"
         
-        payload = {
+        return {
             'parentReference': {
                 'path': parent_path
             },
             'name': dest_name
         }
+    
+    def batch(self, batch_requests: List[Dict]) -> List[Dict]:
+        """
+        Send requests through the Graph JSON batch endpoint.
+        Requests are sent in chunks of 20, so dependsOn may only refer to
+        requests in the same chunk.
         
-        response = requests.patch(url, headers=self._get_headers(), json=payload)
-        response.raise_for_status()
+        Args:
+            batch_requests: Batch request dictionaries with id, method, url and optional headers, body and dependsOn
+            
+        Returns:
+            Batch response dictionaries (id, status, headers, body) in the order of the requests
+        """
+        responses = {}
+        for start in range(0, len(batch_requests), self.BATCH_LIMIT):
+            responses.update(self._send_batch(batch_requests[start:start + self.BATCH_LIMIT]))
+        
+        return [responses.get(request['id'], {'id': request['id'], 'status': 0}) for request in batch_requests]
+    
+    def _send_batch(self, chunk: List[Dict]) -> Dict[str, Dict]:
+        """Send one batch request, resending throttled sub-requests after their Retry-After delay."""
+        responses = {}
+        pending = chunk
+        for attempt in range(self.BATCH_RETRIES + 1):
+            response = self.session.post(
+                f"{self.GRAPH_API_BASE}/$batch",
+                headers=self._get_headers(),
+                json={'requests': pending}
+            )
+            response.raise_for_status()
+            for item in response.json().get('responses', []):
+                responses[item['id']] = item
+            
+            # Resend throttled sub-requests and the ones that failed because they depend on them
+            retry_ids = set()
+            for request in pending:
+                status = responses.get(request['id'], {}).get('status')
+                if status in (429, 503) or (status == 424 and retry_ids.intersection(request.get('dependsOn', []))):
+                    retry_ids.add(request['id'])
+            if not retry_ids or attempt == self.BATCH_RETRIES:
+                break
+            
+            delay = max(
+                self._get_retry_after(responses[request_id], default=2 ** attempt)
+                for request_id in retry_ids
+            )
+            logger.warning("Graph throttled %s batch request(s), retrying in %ss", len(retry_ids), delay)
+            time.sleep(delay)
+            
+            pending = []
+            for request in chunk:
+                if request['id'] in retry_ids:
+                    request = dict(request)
+                    if 'dependsOn' in request:
+                        request['dependsOn'] = [i for i in request['dependsOn'] if i in retry_ids]
+                        if not request['dependsOn']:
+                            del request['dependsOn']
+                    pending.append(request)
+        
+        return responses
+    
+    @staticmethod
+    def _get_retry_after(batch_response: Dict, default: float) -> float:
+        """Read the Retry-After delay in seconds from a batch sub-response."""
+        headers = {key.lower(): value for key, value in (batch_response.get('headers') or {}).items()}
+        try:
+            return float(headers['retry-after'])
+        except (KeyError, ValueError):
+            return default
+    
+    def _check_throttling(self, response, *args, **kwargs):
+        """Slow down when Graph reports that the request rate is close to its throttling limit."""
+        limit_percentage = response.headers.get('x-ms-throttle-limit-percentage')
+        if not limit_percentage:
+            return
+        try:
+            limit = float(limit_percentage)
+        except ValueError:
+            return
+        logger.warning("Graph throttle limit at %.0f%%", limit * 100)
+        if limit >= 1:
+            time.sleep(self.THROTTLE_BACKOFF_SECONDS)
+    
+    def _retry_unauthorized(self, response, *args, **kwargs):
+        """Resend a request once with a refreshed access token if Graph rejected the token, e.g. a revoked cached token."""
+        request = response.request
+        if response.status_code != 401 or getattr(request, 'token_refreshed', False):
+            return None
+        # Upload session and download URLs are pre-authenticated and carry no access token
+        authorization = request.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer '):
+            return None
+        
+        access_token = self._force_refresh(authorization[len('Bearer '):])
+        retry_request = request.copy()
+        retry_request.headers['Authorization'] = f'Bearer {access_token}'
+        retry_request.token_refreshed = True
+        response.close()
+        return self.session.send(retry_request, **kwargs)
+    
+    def upload_and_move(self, uploads: List[Tuple[str, bytes, str]], source_path: str, dest_path: str,
+                        copies: Optional[List[str]] = None):
+        """
+        Upload files, copy the source file and then move it, in a single batch request when possible.
+        The source file is only moved if all uploads and copies succeeded. Copies complete
+        asynchronously, so with copies the move is sent after they have been confirmed.
         
-        logger.info(f"File moved successfully: {source_path} -> {dest_path}")
+        Args:
+            uploads: List of (file_path, content, content_type) tuples to upload
+            source_path: Source file path to move after the uploads
+            dest_path: Destination path for the source file
+            copies: Optional destination paths the source file is copied to on the server before the move
+        """
+        copies = copies or []
+        total_size = sum(len(content) for _, content, _ in uploads)
+        if total_size > self.BATCH_MAX_UPLOAD_BYTES:
+            # Too large for a batch request, upload and copy separately in parallel
+            with ThreadPoolExecutor(max_workers=len(uploads) + len(copies)) as pool:
+                futures = [
+                    pool.submit(self.upload_file, file_path, content, content_type)
+                    for file_path, content, content_type in uploads
+                ]
+                futures += [pool.submit(self.copy_file, source_path, copy_path) for copy_path in copies]
+                for future in futures:
+                    future.result()
+            self.move_file(source_path, dest_path)
+            return
+        
+        batch_requests = []
+        for index, (file_path, content, content_type) in enumerate(uploads, start=1):
+            parent_folder = file_path.rsplit('/', 1)[0] if '/' in file_path else ""
+            self._ensure_folder_exists(parent_folder)
+            batch_requests.append({
+                'id': str(index),
+                'method': 'PUT',
+                'url': self._get_batch_url(f"{self._get_drive_path(file_path)}/content"),
+                'headers': {'Content-Type': content_type},
+                # Non-JSON bodies are sent base64 encoded
+                'body': base64.b64encode(content).decode('ascii')
+            })
+        copy_requests = {}
+        for copy_path in copies:
+            request_id = str(len(batch_requests) + 1)
+            copy_requests[request_id] = copy_path
+            batch_requests.append({
+                'id': request_id,
+                'method': 'POST',
+                'url': f"{self._get_batch_url(self._get_drive_path(source_path))}/copy?{self.COPY_CONFLICT_BEHAVIOR}",
+                'headers': {'Content-Type': 'application/json'},
+                'body': self._prepare_move(copy_path)
+            })
+        if not copies:
+            # Without copies every request completes synchronously, so the move can depend on them
+            batch_requests.append({
+                'id': str(len(batch_requests) + 1),
+                'method': 'PATCH',
+                'url': self._get_batch_url(self._get_drive_path(source_path)),
+                'headers': {'Content-Type': 'application/json'},
+                'body': self._prepare_move(dest_path),
+                'dependsOn': [request['id'] for request in batch_requests]
+            })
+        
+        responses = self.batch(batch_requests)
+        for request, response in zip(batch_requests, responses):
+            status = response['status']
+            if status == 0 or status >= 400:
+                body = response.get('body')
+                error = body.get('error', {}).get('message', '') if isinstance(body, dict) else ''
+                raise requests.HTTPError(
+                    f"Batch {request['method']} {request['url']} failed with status {status}: {error}"
+                )
+        
+        for file_path, _, _ in uploads:
+            logger.info("File uploaded successfully: %s", file_path)
+        
+        if not copies:
+            logger.info("File moved successfully: %s -> %s", source_path, dest_path)
+            return
+        
+        # A copy request is only accepted (202), wait for the copies before moving the source
+        for request, response in zip(batch_requests, responses):
+            if request['id'] in copy_requests:
+                headers = {key.lower(): value for key, value in (response.get('headers') or {}).items()}
+                self._wait_for_copy(headers.get('location'), copy_requests[request['id']])
+                logger.info("File copied successfully: %s -> %s", source_path, copy_requests[request['id']])
+        self.move_file(source_path, dest_path)
+    
+    def _get_batch_url(self, path: str) -> str:
+        """Encode a Graph API path for use in a batch request."""
+        return quote(path, safe="/:")
     
     def file_exists(self, file_path: str) -> bool:
         """
@@ -270,6 +710,6 @@ class OneDriveClient:
         path = self._get_drive_path(file_path)
         url = f"{self.GRAPH_API_BASE}{path}"
         
-        response = requests.get(url, headers=self._get_headers())
+        response = self.session.get(url, headers=self._get_headers())
         return response.status_code == 200
 
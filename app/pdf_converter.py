@@ -4,36 +4,69 @@ Converts the first page of a PDF to JPEG image.
 """
 
 import logging
-from io import BytesIO
-from pdf2image import convert_from_bytes
+import tempfile
+from typing import Optional
+from pdf2image import convert_from_path, pdfinfo_from_path
 
 logger = logging.getLogger(__name__)
 
+# The vision model downsamples large images, so render and encode only what it can use
+MAX_IMAGE_SIZE = 1600
+JPEG_QUALITY = 85
+# Resolution of pages that already fit within MAX_IMAGE_SIZE (the pdf2image default)
+RENDER_DPI = 200
 
-def convert_pdf_to_image(pdf_bytes: bytes) -> bytes:
+# pdftocairo scales the page and encodes the final JPEG itself, so the image is
+# written once and returned as is, without decoding and re-encoding it
+RENDER_OPTIONS = {
+    'use_pdftocairo': True,
+    'fmt': 'jpeg',
+    'dpi': RENDER_DPI,
+    'jpegopt': {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True},
+    'single_file': True,
+    'paths_only': True
+}
+
+
+def _render_size(pdf_path: str) -> Optional[int]:
+    """
+    Return the size to scale the first page down to, or None if it fits within MAX_IMAGE_SIZE.
+    Smaller pages are rendered at RENDER_DPI instead of being enlarged.
+    """
+    # pdfinfo reports the first page size in points, e.g. "612 x 792 pts (letter)"
+    page_size = pdfinfo_from_path(pdf_path).get('Page size', '').split()
+    try:
+        long_side = max(float(page_size[0]), float(page_size[2]))
+    except (IndexError, ValueError):
+        return MAX_IMAGE_SIZE
+    
+    return MAX_IMAGE_SIZE if long_side * RENDER_DPI / 72 > MAX_IMAGE_SIZE else None
+
+
+def convert_pdf_file_to_image(pdf_path: str) -> bytes:
     """
-    Convert first page of PDF to JPEG image.
+    Convert first page of a PDF file on disk to JPEG image.
+    Avoids holding the PDF content in memory.
     
     Args:
-        pdf_bytes: PDF file content as bytes
-        
+        pdf_path: Path to the PDF file
+    
     Returns:
         JPEG image as bytes
     """
     logger.info("Converting PDF to image...")
     
-    # Convert PDF to images (only first page)
-    images = convert_from_bytes(pdf_bytes, first_page=1, last_page=1)
-    
-    if not images:
-        raise ValueError("Failed to extract image from PDF")
-    
-    # Convert PIL Image to bytes
-    img = images[0]
-    img_bytes = BytesIO()
-    img.save(img_bytes, format='JPEG', quality=95)
-    img_bytes.seek(0)
+    with tempfile.TemporaryDirectory() as output_folder:
+        # Convert PDF to a JPEG file (only first page)
+        image_paths = convert_from_path(
+            pdf_path, first_page=1, last_page=1, output_folder=output_folder,
+            size=_render_size(pdf_path), **RENDER_OPTIONS
+        )
+        if not image_paths:
+            raise ValueError("Failed to extract image from PDF")
+        
+        with open(image_paths[0], 'rb') as file:
+            image_bytes = file.read()
     
     logger.info("PDF converted to JPEG successfully")
-    return img_bytes.getvalue()
-
+    return image_bytes
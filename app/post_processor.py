@@ -1,5 +1,12 @@
 import datetime
+import json
 import logging
+import re
+
+
+# Characters not allowed in OneDrive file names, and control characters
+INVALID_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+MAX_FILENAME_LENGTH = 120
 
 
 # A function that takes a text as input and removes possible ```markdown``` code blocks
@@ -23,6 +30,49 @@ def remove_markdown_code_blocks(text: str) -> str:
     return text.strip()
 
 
+def remove_json_code_blocks(text: str) -> str:
+    """
+    Removes a ```json``` code block around the given text, if present.
+
+    Args:
+        text (str): The input text possibly enclosed in a json code block.
+
+    Returns:
+        str: The text without the json code block.
+    """
+    text = text.strip()
+    if text.startswith("```json") and text.endswith("```"):
+        text = text[len("```json"):]
+        text = text[:-len("```")]
+
+    return text.strip()
+
+
+def parse_ocr_response(text: str) -> tuple:
+    """
+    Parses a JSON OCR response containing the extracted title and text.
+
+    Args:
+        text (str): The OCR response, expected to be a JSON object with "title" and "text" keys.
+
+    Returns:
+        tuple: The extracted text and title. If the response is not valid JSON, the whole
+            response is returned as the text and the title is None.
+    """
+    try:
+        data = json.loads(remove_json_code_blocks(text))
+    except ValueError:
+        return text, None
+
+    if not isinstance(data, dict) or not isinstance(data.get("text"), str):
+        return text, None
+
+    title = data.get("title")
+    if not isinstance(title, str) or not title.strip():
+        title = None
+    return data["text"], title
+
+
 def add_datestamp(title):
     """
     Replaces the "{DateStamp}" placeholder in the given title with the current date in the format "%Y%m%d".
@@ -40,3 +90,20 @@ def add_datestamp(title):
     title = title.replace("{DateStamp}", datetime.datetime.now().strftime("%Y%m%d"))
     return title
 
+
+def sanitize_filename(title: str) -> str:
+    """
+    Makes the given title safe to use as a OneDrive file name.
+
+    Args:
+        title (str): The title to be used as a file name.
+
+    Returns:
+        str: The title with path separators, reserved and control characters replaced by "_",
+            truncated to MAX_FILENAME_LENGTH characters.
+
+    Example:
+        >>> sanitize_filename("20240701 Q3: Plan/Budget")
+        '20240701 Q3_ Plan_Budget'
+    """
+    return INVALID_FILENAME_CHARS.sub("_", title).strip()[:MAX_FILENAME_LENGTH].strip()
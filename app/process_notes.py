@@ -4,22 +4,29 @@ Main script to process handwritten notes from OneDrive.
 This script replaces the Azure Logic App functionality.
 """
 
+import asyncio
+import hashlib
 import os
 import sys
 import logging
 import json
+import string
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from dotenv import load_dotenv
+import requests
 
-# Load environment variables from .env file if it exists
-load_dotenv()
+# Load environment variables from app/.env for local runs, GitHub Actions provides them as secrets
+ENV_FILE = Path(__file__).parent / ".env"
+if os.environ.get("GITHUB_ACTIONS") != "true" and ENV_FILE.exists():
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
 
-# Add current directory to path to import local modules
-sys.path.insert(0, str(Path(__file__).parent))
-
-from onedrive_client import OneDriveClient
-from note_processor import NoteProcessor
+from .onedrive_client import OneDriveClient
+from .note_processor import NoteProcessor
+from .pdf_converter import convert_pdf_file_to_image
 
 # Configure logging
 logging.basicConfig(
@@ -28,8 +35,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Supported image extensions
+SUPPORTED_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.pdf'})
+
+# MIME types of uploaded images
+EXT_TO_MIME = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.tiff': 'image/tiff'
+}
+
+# Number of files processed at the same time
+DEFAULT_CONCURRENCY = 8
+
+# Index of content hashes of processed files, kept in the processed folder
+PROCESSED_INDEX_NAME = ".index.json"
+
+# Markdown note with frontmatter
+MARKDOWN_TEMPLATE = string.Template("""---
+note-type: $note_type
+created-date: $created_date
+last-updated: $created_date
+---
+
+![[$image_filename]]
+
+$text
+""")
+
+# PDF rendering is CPU heavy, so it runs one at a time in a separate process,
+# which also keeps the rendered page bitmaps out of this process's memory.
+# Spawn avoids forking a process that is running worker threads.
+_PDF_POOL = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+
 
-def main():
+async def main():
     """Main function to process handwritten notes."""
     
     # Get environment variables
@@ -45,6 +88,13 @@ def main():
     source_folder = os.environ.get("ONEDRIVE_SOURCE_FOLDER") or "Handwritten Notes"
     dest_folder = os.environ.get("ONEDRIVE_DEST_FOLDER") or "second-brain/second-brain/_scans"
     processed_folder = os.environ.get("ONEDRIVE_PROCESSED_FOLDER") or "Handwritten Notes/processed"
+    # At least one file and one thread, a zero semaphore or thread pool would never make progress
+    concurrency = max(1, int(os.environ.get("PROCESS_CONCURRENCY") or DEFAULT_CONCURRENCY))
+    worker_threads = max(1, int(os.environ.get("WORKER_THREADS") or concurrency))
+    
+    # Persist the access token between runs on the same machine (local or self-hosted runners only)
+    token_cache_path = os.environ.get("ONEDRIVE_TOKEN_CACHE")
+    note_type_cache_path = os.environ.get("NOTE_TYPE_CACHE") or ".note_cache.json"
     
     # Validate required environment variables
     if not all([client_id, client_secret, refresh_token]):
@@ -58,138 +108,293 @@ def main():
         logger.error("Ensure your account has access to GitHub Copilot Models.")
         sys.exit(1)
     
+    # Size the thread pool used by asyncio.to_thread to the number of files in flight,
+    # the shared OneDriveClient session is thread-safe
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="onedrive")
+    )
+    
     try:
         # Initialize OneDrive client
         logger.info("Initializing OneDrive client...")
-        onedrive = OneDriveClient(client_id, client_secret, refresh_token)
+        # Keep a pooled connection for every worker thread so connections are reused, not reopened
+        onedrive = OneDriveClient(
+            client_id, client_secret, refresh_token, token_cache_path, pool_size=max(worker_threads, 16)
+        )
+        
+        # Get list of files in source folder, the access token is fetched on first use
+        logger.info("Checking for new files in '%s'...", source_folder)
+        files = await asyncio.to_thread(onedrive.list_files, source_folder, select="name,file,folder")
+        
+        # Skip folders, files in processed subfolder and unsupported file types in one pass,
+        # folders are filtered here because OneDrive personal does not support $filter on children
+        candidates = []
+        for f in files:
+            name = f.get('name', '')
+            if 'folder' in f or name.startswith('processed/'):
+                continue
+            file_ext = Path(name).suffix.lower()
+            if file_ext not in SUPPORTED_EXTENSIONS:
+                logger.info("Skipping unsupported file type: %s", name)
+                continue
+            candidates.append((f, file_ext))
+        
+        if not candidates:
+            logger.info("No files found to process.")
+            return
         
-        # Initialize note processor
+        # Only initialize the note processor when there is something to process
         logger.info("Initializing note processor with GitHub Copilot Models...")
-        processor = NoteProcessor(
+        processor = await asyncio.to_thread(
+            NoteProcessor,
             github_token=github_token,
             model=github_model,
-            base_url=github_models_url
+            base_url=github_models_url,
+            note_type_cache_path=note_type_cache_path
         )
         
-        # Get list of files in source folder
-        logger.info(f"Checking for new files in '{source_folder}'...")
-        files = onedrive.list_files(source_folder)
+        # All notes of a run share the same created date
+        created_date = datetime.now().strftime('%Y-%m-%d %H:%M')
         
-        if not files:
-            logger.info("No files found to process.")
-            return
+        # Process files concurrently
+        processed_count = await process_files(
+            onedrive, processor, candidates, source_folder, dest_folder, processed_folder,
+            created_date, concurrency
+        )
         
-        # Filter out files in processed subfolder and skip folders
-        files = [
-            f for f in files 
-            if 'folder' not in f and not f.get('name', '').startswith('processed/')
-        ]
-        
-        # Supported image extensions
-        supported_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.pdf'}
-        
-        # Process each file
-        processed_count = 0
-        for file_info in files:
-            file_name = file_info['name']
-            file_path = f"{source_folder}/{file_name}"
-            
-            # Get file extension
-            file_ext = Path(file_name).suffix.lower()
-            
-            # Skip if not a supported file type
-            if file_ext not in supported_extensions:
-                logger.info(f"Skipping unsupported file type: {file_name}")
-                continue
-            
-            # Skip if already processed (check if exists in processed folder)
-            processed_path = f"{processed_folder}/{file_name}"
-            try:
-                if onedrive.file_exists(processed_path):
-                    logger.info(f"File already processed: {file_name}")
-                    continue
-            except Exception as e:
-                logger.warning(f"Could not check if file exists in processed folder: {e}")
-                # Continue processing anyway
-            
-            try:
-                logger.info(f"Processing file: {file_name}")
-                
-                # Download file
-                file_content = onedrive.download_file(file_path)
-                
-                # Convert PDF to image if needed
-                if file_ext == '.pdf':
+        logger.info("Processing complete. Processed %s file(s).", processed_count)
+        
+    except Exception as e:
+        logger.error("Fatal error: %s", e, exc_info=True)
+        sys.exit(1)
+
+
+def download_pdf(onedrive, file_path, pdf_path):
+    """
+    Download a PDF to a local file, streaming it to disk so its content is not held in memory.
+    
+    Returns:
+        SHA-256 hex digest of the PDF
+    """
+    with open(pdf_path, 'wb') as fp:
+        onedrive.download_file(file_path, fp)
+    with open(pdf_path, 'rb') as fp:
+        return hashlib.file_digest(fp, 'sha256').hexdigest()
+
+
+def available_name(file_name, taken_names):
+    """Return file_name, or file_name with a " (n)" suffix if that name is already taken."""
+    if file_name not in taken_names:
+        return file_name
+    stem, ext = os.path.splitext(file_name)
+    index = 1
+    while f"{stem} ({index}){ext}" in taken_names:
+        index += 1
+    return f"{stem} ({index}){ext}"
+
+
+def load_processed_hashes(onedrive, index_path):
+    """
+    Load the content hashes of processed files from the index in the processed folder.
+    
+    Returns:
+        Set of SHA-256 hex digests, empty if the index does not exist yet or is invalid,
+        or None if the index could not be read
+    """
+    try:
+        return set(json.loads(onedrive.download_file(index_path)))
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 404:
+            logger.warning("Could not load processed index: %s", e)
+            return None
+    except (ValueError, TypeError) as e:
+        logger.warning("Ignoring invalid processed index: %s", e)
+    return set()
+
+
+def save_processed_hashes(onedrive, index_path, processed_hashes):
+    """Write the content hashes of processed files to the index in the processed folder."""
+    content = json.dumps(sorted(processed_hashes)).encode('utf-8')
+    onedrive.upload_file(index_path, content, 'application/json')
+
+
+async def process_file(onedrive, processor, file_info, file_ext, source_folder, dest_folder, processed_folder,
+                       processed_names, created_date, processed_hashes):
+    """
+    Process a single file from the source folder.
+    Blocking OneDrive calls and PDF conversion run in worker threads.
+    
+    Args:
+        file_ext: Lowercase extension of the file, one of SUPPORTED_EXTENSIONS
+        processed_names: Names of files in the processed folder, updated with the name reserved for this file
+        created_date: Created date written to the markdown frontmatter
+        processed_hashes: Content hashes of processed files, updated with this file on success
+    
+    Returns:
+        True if the file was processed successfully, False otherwise
+    """
+    file_name = file_info['name']
+    file_path = f"{source_folder}/{file_name}"
+    
+    # A file of the same name may have been processed before with different content,
+    # so the content hash decides; the file is moved next to it under a free name
+    name_taken = file_name in processed_names
+    processed_name = available_name(file_name, processed_names)
+    # Reserve the name so no other file of this run is moved to the same path
+    processed_names.add(processed_name)
+    processed_path = f"{processed_folder}/{processed_name}"
+    
+    try:
+        logger.info("Processing file: %s", file_name)
+        if name_taken:
+            logger.info("A file with the same name was already processed, checking its content: %s", file_name)
+        
+        # Download file, converting PDF to image if needed
+        is_pdf = file_ext == '.pdf'
+        if is_pdf:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                pdf_path = os.path.join(temp_dir, "note.pdf")
+                content_hash = await asyncio.to_thread(download_pdf, onedrive, file_path, pdf_path)
+                # Only render PDFs whose content was not processed before
+                if content_hash not in processed_hashes:
                     logger.info("Converting PDF to image...")
-                    from pdf_converter import convert_pdf_to_image
-                    image_bytes = convert_pdf_to_image(file_content)
-                    file_ext = '.jpg'  # Update extension for output
-                else:
-                    image_bytes = file_content
-                
-                # Process the image
-                logger.info("Extracting text from image...")
-                result = processor.process_image(image_bytes)
-                
-                # Create markdown content
-                markdown_content = create_markdown_content(
-                    result['noteType'],
-                    result['extractedTitle'],
-                    result['extractedText'],
-                    file_ext
-                )
-                
-                # Save markdown file
-                markdown_filename = f"{result['extractedTitle']}.md"
-                markdown_path = f"{dest_folder}/{markdown_filename}"
-                logger.info(f"Saving markdown file: {markdown_path}")
-                onedrive.upload_file(markdown_path, markdown_content.encode('utf-8'), 'text/markdown')
-                
-                # Copy image to destination folder
-                image_filename = f"{result['extractedTitle']}{file_ext}"
-                image_path = f"{dest_folder}/{image_filename}"
-                logger.info(f"Copying image to: {image_path}")
-                onedrive.upload_file(image_path, image_bytes, f'image/{file_ext[1:]}')
-                
-                # Move original file to processed folder
-                logger.info(f"Moving file to processed folder: {processed_path}")
-                onedrive.move_file(file_path, processed_path)
-                
-                processed_count += 1
-                logger.info(f"Successfully processed: {file_name}")
-                
-            except Exception as e:
-                logger.error(f"Error processing file {file_name}: {str(e)}", exc_info=True)
-                continue
+                    image_bytes = await asyncio.get_running_loop().run_in_executor(
+                        _PDF_POOL, convert_pdf_file_to_image, pdf_path
+                    )
+            file_ext = '.jpg'  # Update extension for output
+        else:
+            image_bytes = await asyncio.to_thread(onedrive.download_file, file_path)
+            content_hash = hashlib.sha256(image_bytes).hexdigest()
+        
+        # Skip the model calls if the same content was processed before, e.g. under another name
+        if content_hash in processed_hashes:
+            logger.info("File content already processed, moving to processed folder: %s", file_name)
+            await asyncio.to_thread(onedrive.move_file, file_path, processed_path)
+            return False
+        
+        # Process the image
+        logger.info("Extracting text from image...")
+        result = await processor.aprocess_image(image_bytes)
+        
+        # Create markdown content
+        markdown_content = create_markdown_content(
+            result['noteType'],
+            result['extractedTitle'],
+            result['extractedText'],
+            file_ext,
+            created_date
+        )
         
-        logger.info(f"Processing complete. Processed {processed_count} file(s).")
+        # Save markdown file and copy image to destination folder
+        markdown_filename = f"{result['extractedTitle']}.md"
+        markdown_path = f"{dest_folder}/{markdown_filename}"
+        image_filename = f"{result['extractedTitle']}{file_ext}"
+        image_path = f"{dest_folder}/{image_filename}"
+        logger.info("Saving markdown file: %s", markdown_path)
+        logger.info("Copying image to: %s", image_path)
+        
+        uploads = [(markdown_path, markdown_content.encode('utf-8'), 'text/markdown')]
+        copies = []
+        if is_pdf:
+            # The image was rendered locally, so it has to be uploaded
+            uploads.append((image_path, image_bytes, EXT_TO_MIME[file_ext]))
+        else:
+            # The image is the original file, copy it on the server instead of uploading it again
+            copies.append(image_path)
+        
+        # Then move original file to processed folder, batched into one request where possible
+        logger.info("Moving file to processed folder: %s", processed_path)
+        await asyncio.to_thread(
+            onedrive.upload_and_move,
+            uploads,
+            file_path,
+            processed_path,
+            copies
+        )
+        
+        processed_hashes.add(content_hash)
+        logger.info("Successfully processed: %s", file_name)
+        return True
         
     except Exception as e:
-        logger.error(f"Fatal error: {str(e)}", exc_info=True)
-        sys.exit(1)
+        logger.error("Error processing file %s: %s", file_name, e, exc_info=True)
+        return False
 
 
-def create_markdown_content(note_type, title, text, image_ext):
-    """Create markdown content with frontmatter."""
-    now = datetime.now()
-    created_date = now.strftime('%Y-%m-%d %H:%M')
+async def process_files(onedrive, processor, files, source_folder, dest_folder, processed_folder,
+                        created_date, concurrency: int = DEFAULT_CONCURRENCY):
+    """
+    Process files from the source folder concurrently.
+    At most `concurrency` files are in flight at once, and their blocking
+    OneDrive calls run in the event loop's default thread pool.
+    Closes the note processor once all files are done.
     
-    # Use Obsidian image link format
-    image_filename = f"{title}{image_ext}"
+    Args:
+        files: List of (file_info, file_ext) tuples of supported files
+        created_date: Created date written to the markdown frontmatter, formatted as YYYY-MM-DD HH:MM
     
-    content = f"""---
-note-type: {note_type}
-created-date: {created_date}
-last-updated: {created_date}
----
+    Returns:
+        Number of files processed successfully
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    # List the processed folder once instead of probing for each file
+    processed_names = set()
+    try:
+        processed_files = await asyncio.to_thread(onedrive.list_files, processed_folder, select="name,folder")
+        processed_names = {f['name'] for f in processed_files if 'folder' not in f}
+    except requests.HTTPError as e:
+        # The processed folder does not exist until the first file is moved there
+        if e.response is None or e.response.status_code != 404:
+            logger.warning("Could not list processed folder: %s", e)
+    except Exception as e:
+        logger.warning("Could not list processed folder: %s", e)
+        # Continue processing anyway
+    
+    async def process_bounded(file_info, file_ext):
+        async with semaphore:
+            return await process_file(
+                onedrive, processor, file_info, file_ext, source_folder, dest_folder, processed_folder,
+                processed_names, created_date, processed_hashes
+            )
+    
+    # Load the content hashes of processed files once, and write them back once after the run
+    index_path = f"{processed_folder}/{PROCESSED_INDEX_NAME}"
+    processed_hashes = await asyncio.to_thread(load_processed_hashes, onedrive, index_path)
+    # Never overwrite an existing index that could not be read, it would lose its hashes
+    index_loaded = processed_hashes is not None
+    if not index_loaded:
+        processed_hashes = set()
+    known_hashes = len(processed_hashes)
+    
+    try:
+        results = await asyncio.gather(*(process_bounded(f, ext) for f, ext in files))
+    finally:
+        await processor.close()
+        if not index_loaded:
+            logger.warning("Not saving processed index because it could not be loaded")
+        elif len(processed_hashes) > known_hashes:
+            try:
+                await asyncio.to_thread(save_processed_hashes, onedrive, index_path, processed_hashes)
+            except Exception as e:
+                logger.warning("Could not save processed index: %s", e)
+    
+    return sum(results)
 
-![[{image_filename}]]
 
-{text}
-"""
-    return content
+def create_markdown_content(note_type, title, text, image_ext, created_date):
+    """Create markdown content with frontmatter."""
+    # Use Obsidian image link format
+    image_filename = f"{title}{image_ext}"
+    
+    return MARKDOWN_TEMPLATE.substitute(
+        note_type=note_type,
+        created_date=created_date,
+        image_filename=image_filename,
+        text=text
+    )
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 
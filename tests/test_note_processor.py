@@ -0,0 +1,49 @@
+import unittest
+from unittest import mock
+
+import httpx
+from openai import BadRequestError
+
+from app import note_processor
+from app.note_processor import NoteProcessor
+
+
+def bad_request(message, param=None):
+    """Build the error the OpenAI client raises for a 400 response."""
+    request = httpx.Request("POST", "https://models.github.ai/inference/chat/completions")
+    body = {"message": message, "param": param, "code": "invalid_request_error"}
+    return BadRequestError(message, response=httpx.Response(400, request=request), body=body)
+
+
+class ExtractTextTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.processor = NoteProcessor("token")
+    
+    async def asyncTearDown(self):
+        await self.processor.client.close()
+    
+    async def test_falls_back_when_json_mode_is_rejected(self):
+        error = bad_request("'response_format' of type 'json_object' is not supported", "response_format")
+        completion = mock.AsyncMock(side_effect=[error, "text", "more text"])
+        with mock.patch.object(note_processor, "execute_image_completion", completion):
+            self.assertEqual(await self.processor._extract_text("data:image/jpeg;base64,", "prompt"), "text")
+            self.assertEqual(await self.processor._extract_text("data:image/jpeg;base64,", "prompt"), "more text")
+        
+        self.assertFalse(self.processor.json_mode)
+        self.assertEqual(completion.await_args_list[0].kwargs, {"response_format": {"type": "json_object"}})
+        self.assertEqual(completion.await_args_list[1].kwargs, {})
+        self.assertEqual(completion.await_args_list[2].kwargs, {})
+    
+    async def test_reraises_other_invalid_requests(self):
+        error = bad_request("Image is too large", "messages")
+        completion = mock.AsyncMock(side_effect=error)
+        with mock.patch.object(note_processor, "execute_image_completion", completion):
+            with self.assertRaises(BadRequestError):
+                await self.processor._extract_text("data:image/jpeg;base64,", "prompt")
+        
+        self.assertTrue(self.processor.json_mode)
+        self.assertEqual(completion.await_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
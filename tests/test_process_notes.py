@@ -0,0 +1,49 @@
+import unittest
+from unittest import mock
+
+from app import process_notes
+
+
+class FakeOneDrive:
+    """In-memory stand-in for OneDriveClient, recording where files are moved."""
+    
+    def __init__(self, processed_names):
+        self.processed_names = processed_names
+        self.moves = []
+    
+    def list_files(self, folder_path, select=None):
+        return [{'name': name, 'file': {}} for name in self.processed_names]
+    
+    def download_file(self, file_path):
+        if file_path.endswith(process_notes.PROCESSED_INDEX_NAME):
+            return b'[]'
+        return file_path.encode('utf-8')
+    
+    def upload_file(self, file_path, content, content_type=None):
+        pass
+    
+    def upload_and_move(self, uploads, source_path, dest_path, copies=None):
+        self.moves.append((source_path, dest_path))
+
+
+class ProcessFilesTest(unittest.IsolatedAsyncioTestCase):
+    async def test_free_names_are_not_reused_within_a_run(self):
+        onedrive = FakeOneDrive(['a.jpg'])
+        processor = mock.AsyncMock()
+        processor.aprocess_image.side_effect = [
+            {'noteType': "OTHER", 'extractedTitle': title, 'extractedText': "text"} for title in ("A", "B")
+        ]
+        files = [({'name': 'a.jpg'}, '.jpg'), ({'name': 'a (1).jpg'}, '.jpg')]
+        
+        processed = await process_notes.process_files(
+            onedrive, processor, files, 'src', 'dst', 'src/processed', '2026-10-14 10:00'
+        )
+        
+        self.assertEqual(processed, 2)
+        destinations = [dest_path for _, dest_path in onedrive.moves]
+        self.assertEqual(len(set(destinations)), 2)
+        self.assertNotIn('src/processed/a.jpg', destinations)
+
+
+if __name__ == "__main__":
+    unittest.main()